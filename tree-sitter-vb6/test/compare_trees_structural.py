@@ -7,17 +7,32 @@ This performs a full structural comparison, not just count-based.
 from __future__ import annotations
 
 import argparse
+import hashlib
+import importlib
+import io
 import os
+import pickle
 import re
+import signal
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from difflib import SequenceMatcher
 from pathlib import Path
-from typing import Optional
+from typing import AbstractSet, Any, Callable, Iterable, Iterator, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class TreeNode:
-    """Represents a node in a parse tree."""
+    """Represents a node in a parse tree.
+
+    Uses __slots__ since a large .tree file produces many thousands of nodes.
+    """
     node_type: str
     children: list["TreeNode"] = field(default_factory=list)
     text: str = ""  # Literal text content (for terminals)
@@ -25,7 +40,7 @@ class TreeNode:
     start_pos: tuple[int, int] = (0, 0)
     end_pos: tuple[int, int] = (0, 0)
 
-    def __repr__(self):
+    def __repr__(self) -> str:
         if self.children:
             return f"({self.node_type} [{len(self.children)} children])"
         elif self.text:
@@ -35,19 +50,22 @@ class TreeNode:
 
     def pretty_print(self, indent: int = 0) -> str:
         """Pretty print the tree."""
-        prefix = "  " * indent
-        if self.field_name:
-            result = f"{prefix}{self.field_name}: ({self.node_type})"
-        else:
-            result = f"{prefix}({self.node_type})"
-
-        if self.text:
-            result += f" '{self.text}'"
-
-        lines = [result]
-        for child in self.children:
-            lines.append(child.pretty_print(indent + 1))
-        return "\n".join(lines)
+        # Written in one pass into a single buffer, without recursion
+        out = io.StringIO()
+        stack: list[tuple[TreeNode, int]] = [(self, indent)]
+        while stack:
+            node, depth = stack.pop()
+            if node is not self:
+                out.write("\n")
+            out.write("  " * depth)
+            if node.field_name:
+                out.write(f"{node.field_name}: ")
+            out.write(f"({node.node_type})")
+            if node.text:
+                out.write(f" '{node.text}'")
+            stack.extend((c, depth + 1) for c in reversed(node.children))
+
+        return out.getvalue()
 
     def get_significant_children(self) -> list["TreeNode"]:
         """Get children that are significant for comparison (skip noise nodes)."""
@@ -154,179 +172,136 @@ ANTLR_TO_TS_NODE_MAP = {
 # Reverse mapping for lookup
 TS_TO_ANTLR_NODE_MAP = {v: k for k, v in ANTLR_TO_TS_NODE_MAP.items()}
 
+# Statement-level nodes for each parser, as compared by compare_trees()
+ANTLR_STMT_TYPES = frozenset(ANTLR_TO_TS_NODE_MAP)
+TS_STMT_TYPES = frozenset(ANTLR_TO_TS_NODE_MAP.values())
+
 SOURCE_EXTS = {".cls", ".vb", ".bas", ".frm"}
 NPX = "npx.cmd" if os.name == "nt" else "npx"
+NODE = "node"
+TS_SERVER_SCRIPT = Path(__file__).resolve().parent / "ts_parse_server.js"
+TS_SERVER_READY = b"---READY---"
+TS_SERVER_END = b"---END---"
+
+
+# One token of the ANTLR S-expression format, with the whitespace before it.
+# Whitespace is only " \t\n\r", as in the ANTLR output, so `\s` is not used.
+#   name          - "(" followed by a rule name (empty for a literal paren)
+#   token_close   - a literal ")" token, i.e. a ")" followed by another paren
+#   close         - the ")" that closes the current node
+#   string        - a quoted string, up to the closing unescaped quote
+#   escape        - a backslash-escaped character like \n, which is skipped
+#   word          - anything else, up to the next whitespace or paren
+ANTLR_TOKEN_RE = re.compile(
+    r'[ \t\n\r]*(?:'
+    r'\([ \t\n\r]*(?P<name>[^ \t\n\r()]*)'
+    r'|(?P<token_close>\))(?=[ \t\n\r]*[()])'
+    r'|(?P<close>\))'
+    r'|(?P<string>"(?:[^"\\]+|\\[\s\S]?)*"?)'
+    r'|(?P<escape>\\[\s\S])'
+    r'|(?P<word>[^ \t\n\r()]+)'
+    r')'
+)
 
 
 def parse_antlr_tree(text: str) -> TreeNode:
-    """Parse an ANTLR S-expression tree into a TreeNode structure."""
+    """Parse an ANTLR S-expression tree into a TreeNode structure.
+
+    The tree is built with an explicit stack of open nodes, so deeply nested
+    expressions cannot hit the recursion limit. Node types are interned so
+    the many lookups in the noise sets and node map hit on identity.
+    """
     text = text.strip()
+    end = len(text)
     pos = 0
-
-    def skip_whitespace():
-        nonlocal pos
-        while pos < len(text) and text[pos] in " \t\n\r":
-            pos += 1
-
-    def parse_node() -> Optional[TreeNode]:
-        nonlocal pos
-        skip_whitespace()
-
-        if pos >= len(text):
-            return None
-
-        if text[pos] != "(":
-            # This is a terminal/literal token
-            start = pos
-            # Handle quoted strings
-            if text[pos] == '"':
-                pos += 1
-                while pos < len(text) and text[pos] != '"':
-                    if text[pos] == '\\' and pos + 1 < len(text):
-                        pos += 2
-                    else:
-                        pos += 1
-                if pos < len(text):
-                    pos += 1
-                return TreeNode(node_type="LITERAL", text=text[start:pos])
-            # Handle backslash-escaped characters like \n
-            elif text[pos] == '\\' and pos + 1 < len(text):
-                pos += 2
-                return None  # Skip escape sequences
-            else:
-                # Read until whitespace or paren
-                while pos < len(text) and text[pos] not in " \t\n\r()":
-                    pos += 1
-                token = text[start:pos]
-                if token:
-                    return TreeNode(node_type="TOKEN", text=token)
-                return None
-
-        # Skip '('
-        pos += 1
-        skip_whitespace()
-
-        # Read node type
-        start = pos
-        while pos < len(text) and text[pos] not in " \t\n\r()":
-            pos += 1
-        node_type = text[start:pos]
-
-        if not node_type:
-            # This is a literal "(" or ")" token in ANTLR format
-            # e.g., in "(argList ( (arg ...))", the standalone "(" represents
-            # the literal parenthesis in VB6 source code like "Sub Test("
-            # We need to find the matching ")" for this empty node
-            if pos < len(text) and text[pos] == ")":
-                # Empty parens "()" - represents literal "()" token
-                pos += 1
-                return TreeNode(node_type="TOKEN", text="()")
-            elif pos < len(text) and text[pos] == "(":
-                # "( (" pattern - the first "(" is a literal token
-                # Don't consume anything more, just return the "(" token
-                # The caller will continue to parse the real "(node ...)"
-                return TreeNode(node_type="TOKEN", text="(")
-            else:
-                # Malformed - skip to closing paren
-                while pos < len(text) and text[pos] != ")":
-                    pos += 1
-                if pos < len(text):
-                    pos += 1
-                return None
-
-        node = TreeNode(node_type=node_type)
-
-        # Parse children
-        while True:
-            skip_whitespace()
-            if pos >= len(text):
+    stack: list[TreeNode] = []
+    # Local aliases for the hot loop
+    next_token = ANTLR_TOKEN_RE.match
+    push = stack.append
+    pop = stack.pop
+    intern = sys.intern
+    Node = TreeNode
+
+    while True:
+        match = next_token(text, pos)
+        node: Optional[TreeNode] = None
+
+        if match is None:
+            # End of input: close every open node
+            if not stack:
                 break
-            if text[pos] == ")":
-                # Check if this ) is a literal TOKEN or the structural close
-                # In ANTLR format, ` ) )` means the first ) is a TOKEN
-                # Look ahead to see what follows this )
-                lookahead = pos + 1
-                while lookahead < len(text) and text[lookahead] in " \t\n\r":
-                    lookahead += 1
-                if lookahead < len(text) and text[lookahead] in "()":
-                    # Another paren follows, so this ) is a TOKEN
-                    pos += 1  # consume the )
-                    node.children.append(TreeNode(node_type="TOKEN", text=")"))
+            node = pop()
+        else:
+            pos = match.end()
+            kind = match.lastgroup
+            if kind == "name":
+                node_type = match.group("name")
+                if node_type:
+                    push(Node(node_type=intern(node_type)))
                     continue
-                else:
-                    # This ) ends the current node
-                    break
-            child = parse_node()
-            if child:
-                node.children.append(child)
+                # This is a literal "(" or ")" token in ANTLR format
+                # e.g., in "(argList ( (arg ...))", the standalone "(" represents
+                # the literal parenthesis in VB6 source code like "Sub Test("
+                if pos < end and text[pos] == ")":
+                    # Empty parens "()" - represents literal "()" token
+                    pos += 1
+                    node = Node(node_type="TOKEN", text="()")
+                elif pos < end:
+                    # "( (" pattern - the first "(" is a literal token
+                    # Don't consume anything more, the real "(node ...)"
+                    # is parsed on the next iteration
+                    node = Node(node_type="TOKEN", text="(")
+            elif kind == "token_close" and stack:
+                # In ANTLR format, ` ) )` means the first ) is a literal TOKEN
+                node = Node(node_type="TOKEN", text=")")
+            elif kind == "close" and stack:
+                # This ) ends the current node
+                node = pop()
+            elif kind == "string":
+                node = Node(node_type="LITERAL", text=match.group("string"))
+            elif kind == "word":
+                node = Node(node_type="TOKEN", text=match.group("word"))
+
+        if stack:
+            if node is not None:
+                stack[-1].children.append(node)
+        else:
+            # Only the first top-level element is the tree
+            return node if node else Node(node_type="ERROR")
 
-        # Skip ')'
-        if pos < len(text) and text[pos] == ")":
-            pos += 1
+    return TreeNode(node_type="ERROR")
 
-        return node
 
-    result = parse_node()
-    return result if result else TreeNode(node_type="ERROR")
+# One node line of tree-sitter output, e.g.
+#   "    name: (identifier [1, 4] - [1, 8])"
+# with the first [row, col] - [row, col] on the line as its position.
+TS_LINE_RE = re.compile(
+    r"^(?P<indent>[ \t]*)"
+    r"(?:(?P<field>\w+): )?"
+    r"\((?P<type>[^\s()]+)"
+    r"(?:.*?\[(?P<sr>\d+), (?P<sc>\d+)\] - \[(?P<er>\d+), (?P<ec>\d+)\])?",
+    re.M,
+)
 
 
 def parse_ts_tree(text: str) -> TreeNode:
     """Parse a tree-sitter S-expression output into a TreeNode structure."""
-    lines = text.strip().split("\n")
-    if not lines:
-        return TreeNode(node_type="ERROR")
-
-    # Parse position pattern: [row, col] - [row, col]
-    pos_pattern = re.compile(r'\[(\d+), (\d+)\] - \[(\d+), (\d+)\]')
-
-    def parse_line(line: str) -> tuple[int, str, str, tuple, tuple]:
-        """Parse a line and return (indent, field_name, node_type, start_pos, end_pos)."""
-        # Count leading spaces for indent
-        stripped = line.lstrip()
-        indent = len(line) - len(stripped)
-
-        field_name = ""
-        if ": (" in stripped:
-            field_name, rest = stripped.split(": (", 1)
-            stripped = "(" + rest
-
-        # Extract node type and positions
-        if stripped.startswith("("):
-            parts = stripped[1:].split()
-            node_type = parts[0] if parts else ""
-
-            # Find position
-            match = pos_pattern.search(stripped)
-            if match:
-                start_pos = (int(match.group(1)), int(match.group(2)))
-                end_pos = (int(match.group(3)), int(match.group(4)))
-            else:
-                start_pos = (0, 0)
-                end_pos = (0, 0)
-
-            # Remove trailing )
-            node_type = node_type.rstrip(")")
-
-            return indent, field_name, node_type, start_pos, end_pos
-
-        return indent, "", "", (0, 0), (0, 0)
-
     # Build tree from indented output
     root = None
     stack: list[tuple[int, TreeNode]] = []
 
-    for line in lines:
-        if not line.strip():
-            continue
-
-        indent, field_name, node_type, start_pos, end_pos = parse_line(line)
-
-        if not node_type:
-            continue
+    for match in TS_LINE_RE.finditer(text.strip()):
+        indent_text, field_name, node_type, sr, sc, er, ec = match.groups()
+        indent = len(indent_text)
+        if sr is not None:
+            start_pos = (int(sr), int(sc))
+            end_pos = (int(er), int(ec))
+        else:
+            start_pos = end_pos = (0, 0)
 
         node = TreeNode(
-            node_type=node_type,
-            field_name=field_name,
+            node_type=sys.intern(node_type),
+            field_name=sys.intern(field_name) if field_name else "",
             start_pos=start_pos,
             end_pos=end_pos
         )
@@ -347,21 +322,54 @@ def parse_ts_tree(text: str) -> TreeNode:
 
 def flatten_significant_nodes(node: TreeNode, noise_nodes: set[str]) -> list[TreeNode]:
     """Flatten tree to list of significant nodes (skipping noise nodes)."""
-    result = []
-
-    def traverse(n: TreeNode):
-        if n.node_type in noise_nodes:
-            for child in n.children:
-                traverse(child)
-        else:
+    result: list[TreeNode] = []
+    # Pre-order walk; children are pushed in reverse so they pop in order
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if n.node_type not in noise_nodes:
             result.append(n)
-            for child in n.children:
-                traverse(child)
+        if n.children:
+            stack.extend(n.children[::-1])
 
-    traverse(node)
     return result
 
 
+def to_arrays(root: TreeNode) -> tuple[list[str], list[int], list[str]]:
+    """Flatten a tree into parallel (types, parents, texts) lists in pre-order.
+
+    parents[i] is the index of node i's parent, or -1 for the root. This is
+    the compact form trees are serialized in: unlike a TreeNode graph it
+    pickles without recursion. Field names and positions are not kept, so
+    it is meant for ANTLR trees.
+    """
+    types: list[str] = []
+    parents: list[int] = []
+    texts: list[str] = []
+    stack: list[tuple[TreeNode, int]] = [(root, -1)]
+    while stack:
+        node, parent = stack.pop()
+        index = len(types)
+        types.append(node.node_type)
+        parents.append(parent)
+        texts.append(node.text)
+        stack.extend((c, index) for c in reversed(node.children))
+
+    return types, parents, texts
+
+
+def from_arrays(types: list[str], parents: list[int], texts: list[str]) -> TreeNode:
+    """Rebuild a tree from the lists returned by to_arrays()."""
+    nodes: list[TreeNode] = []
+    for node_type, parent, text in zip(types, parents, texts):
+        node = TreeNode(node_type=sys.intern(node_type), text=text)
+        if parent >= 0:
+            nodes[parent].children.append(node)
+        nodes.append(node)
+
+    return nodes[0] if nodes else TreeNode(node_type="ERROR")
+
+
 def get_structural_signature(node: TreeNode, noise_nodes: set[str], depth: int = 0, max_depth: int = 10) -> str:
     """Get a structural signature of the tree for comparison."""
     if depth > max_depth:
@@ -398,37 +406,33 @@ class ComparisonResult:
     details: str = ""
 
 
-def extract_statement_nodes(node: TreeNode, stmt_types: set[str]) -> list[TreeNode]:
+def extract_statement_nodes(node: TreeNode, stmt_types: AbstractSet[str]) -> list[TreeNode]:
     """Extract all statement-level nodes from a tree."""
-    result = []
-
-    def traverse(n: TreeNode):
+    result: list[TreeNode] = []
+    # Pre-order walk; children are pushed in reverse so they pop in order
+    stack = [node]
+    while stack:
+        n = stack.pop()
         if n.node_type in stmt_types:
             result.append(n)
-        for child in n.children:
-            traverse(child)
+        if n.children:
+            stack.extend(n.children[::-1])
 
-    traverse(node)
     return result
 
 
-def compare_trees(antlr_tree: TreeNode, ts_tree: TreeNode) -> ComparisonResult:
-    """Compare ANTLR and tree-sitter parse trees structurally."""
+def _describe_range(start: int, end: int) -> str:
+    return str(start) if end - start == 1 else f"{start}-{end - 1}"
 
-    # Define statement-level nodes for each parser
-    antlr_stmt_types = set(ANTLR_TO_TS_NODE_MAP.keys())
-    ts_stmt_types = set(ANTLR_TO_TS_NODE_MAP.values())
 
-    # Extract statement nodes
-    antlr_stmts = extract_statement_nodes(antlr_tree, antlr_stmt_types)
-    ts_stmts = extract_statement_nodes(ts_tree, ts_stmt_types)
+def _describe_nodes(start: int, end: int) -> str:
+    if end - start == 1:
+        return f"node at {start}"
+    return f"nodes at {_describe_range(start, end)}"
 
-    antlr_types = [n.node_type for n in antlr_stmts]
-    ts_types = [n.node_type for n in ts_stmts]
-
-    # Map ANTLR types to TS types for comparison
-    mapped_antlr_types = [ANTLR_TO_TS_NODE_MAP.get(t, t) for t in antlr_types]
 
+def _describe_mismatches(antlr_types: list[str], mapped_antlr_types: list[str], ts_types: list[str]) -> list[str]:
+    """Describe how the mapped ANTLR statements differ from tree-sitter's."""
     mismatches = []
 
     # Compare counts
@@ -437,22 +441,50 @@ def compare_trees(antlr_tree: TreeNode, ts_tree: TreeNode) -> ComparisonResult:
             f"Node count mismatch: ANTLR has {len(antlr_types)}, tree-sitter has {len(ts_types)}"
         )
 
-    # Compare sequence
-    min_len = min(len(mapped_antlr_types), len(ts_types))
-    for i in range(min_len):
-        if mapped_antlr_types[i] != ts_types[i]:
+    # Align the sequences (longest matching blocks) so a single missing or
+    # extra statement is reported once instead of shifting every later one
+    matcher = SequenceMatcher(a=mapped_antlr_types, b=ts_types, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if tag == "delete":
+            mismatches.append(
+                f"Extra ANTLR {_describe_nodes(i1, i2)}: {', '.join(antlr_types[i1:i2])}"
+            )
+        elif tag == "insert":
             mismatches.append(
-                f"Position {i}: ANTLR '{antlr_types[i]}' -> '{mapped_antlr_types[i]}', "
-                f"tree-sitter '{ts_types[i]}'"
+                f"Extra tree-sitter {_describe_nodes(j1, j2)}: {', '.join(ts_types[j1:j2])}"
+            )
+        else:
+            position = _describe_range(i1, i2)
+            if (i1, i2) != (j1, j2):
+                position += f" (tree-sitter {_describe_range(j1, j2)})"
+            antlr_desc = ", ".join(
+                f"'{a}' -> '{m}'" for a, m in zip(antlr_types[i1:i2], mapped_antlr_types[i1:i2])
             )
+            ts_desc = ", ".join(f"'{t}'" for t in ts_types[j1:j2])
+            mismatches.append(f"Position {position}: ANTLR {antlr_desc}, tree-sitter {ts_desc}")
+
+    return mismatches
+
+
+def compare_trees(antlr_tree: TreeNode, ts_tree: TreeNode) -> ComparisonResult:
+    """Compare ANTLR and tree-sitter parse trees structurally."""
+
+    # Extract statement nodes
+    antlr_stmts = extract_statement_nodes(antlr_tree, ANTLR_STMT_TYPES)
+    ts_stmts = extract_statement_nodes(ts_tree, TS_STMT_TYPES)
+
+    antlr_types = [n.node_type for n in antlr_stmts]
+    ts_types = [n.node_type for n in ts_stmts]
 
-    # Report extra nodes
-    if len(mapped_antlr_types) > len(ts_types):
-        for i in range(len(ts_types), len(mapped_antlr_types)):
-            mismatches.append(f"Extra ANTLR node at {i}: {antlr_types[i]}")
-    elif len(ts_types) > len(mapped_antlr_types):
-        for i in range(len(mapped_antlr_types), len(ts_types)):
-            mismatches.append(f"Extra tree-sitter node at {i}: {ts_types[i]}")
+    # Map ANTLR types to TS types for comparison. Only ANTLR_STMT_TYPES were
+    # extracted, so every type is a key and needs no fallback.
+    mapped_antlr_types = list(map(ANTLR_TO_TS_NODE_MAP.__getitem__, antlr_types))
+
+    # Matching files (the [OK] case) need no alignment
+    matches = mapped_antlr_types == ts_types
+    mismatches = [] if matches else _describe_mismatches(antlr_types, mapped_antlr_types, ts_types)
 
     # Build details
     details_lines = [
@@ -463,7 +495,7 @@ def compare_trees(antlr_tree: TreeNode, ts_tree: TreeNode) -> ComparisonResult:
     ]
 
     return ComparisonResult(
-        matches=len(mismatches) == 0,
+        matches=matches,
         antlr_nodes=antlr_types,
         ts_nodes=ts_types,
         mismatches=mismatches,
@@ -471,37 +503,356 @@ def compare_trees(antlr_tree: TreeNode, ts_tree: TreeNode) -> ComparisonResult:
     )
 
 
-def run_tree_sitter_parse(tree_sitter_dir: Path, file_path: Path) -> str:
-    """Run tree-sitter parse and return the output."""
+def split_tree_sitter_output(lines: Iterable[bytes]) -> list[str]:
+    """Split `tree-sitter parse` output into one S-expression tree per file.
+
+    Each tree starts with a `(source_file` line and continues over the
+    indented lines below it. Anything else (timing or error summaries)
+    ends the current tree. Only the kept lines are decoded.
+    """
+    trees: list[list[bytes]] = []
+    current: Optional[list[bytes]] = None
+    for line in lines:
+        if line.lstrip().startswith(b"(source_file"):
+            current = [line.rstrip(b"\r\n")]
+            trees.append(current)
+        elif current is not None and line[:1].isspace():
+            current.append(line.rstrip(b"\r\n"))
+        else:
+            current = None
+
+    return [b"\n".join(tree).decode("utf-8", errors="replace").strip() for tree in trees]
+
+
+def _relative_to(path: Path, base: Path) -> Path:
     try:
-        rel_path = file_path.relative_to(tree_sitter_dir)
+        return path.relative_to(base)
     except ValueError:
-        rel_path = file_path
+        return path
 
-    result = subprocess.run(
-        [NPX, "tree-sitter", "parse", str(rel_path)],
+
+def _kill_process_tree(proc: subprocess.Popen[bytes]) -> None:
+    # npx (or a node wrapper) starts the real node as a child, which keeps
+    # stdout open if only the parent is killed
+    try:
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+
+
+# Subprocesses that are still running. They get their own process group so
+# they can be killed as a whole, which also keeps the terminal's Ctrl+C from
+# reaching them; main() kills them itself with kill_subprocesses().
+_live_procs: set[subprocess.Popen[bytes]] = set()
+_live_procs_lock = threading.Lock()
+_interrupted = threading.Event()
+
+
+def _start_process(cmd: list[str], **kwargs: Any) -> subprocess.Popen[bytes]:
+    """Start a tracked subprocess in its own process group."""
+    with _live_procs_lock:
+        if _interrupted.is_set():
+            raise KeyboardInterrupt
+        proc: subprocess.Popen[bytes] = subprocess.Popen(
+            cmd, start_new_session=os.name != "nt", **kwargs
+        )
+        _live_procs.add(proc)
+    return proc
+
+
+def _forget_process(proc: subprocess.Popen[bytes]) -> None:
+    with _live_procs_lock:
+        _live_procs.discard(proc)
+
+
+def kill_subprocesses() -> None:
+    """Kill all running subprocesses and stop new ones from starting."""
+    with _live_procs_lock:
+        _interrupted.set()
+        procs = list(_live_procs)
+    for proc in procs:
+        _kill_process_tree(proc)
+
+
+@contextmanager
+def _kill_on_timeout(timeout: float, kill: Callable[[], None], cmd: list[str]) -> Iterator[None]:
+    """Call `kill` if the block runs longer than `timeout`, then raise TimeoutExpired.
+
+    Reading a subprocess's stdout blocks, so the timeout is enforced by a
+    timer; killing the process ends the read.
+    """
+    timed_out = threading.Event()
+
+    def on_timeout() -> None:
+        timed_out.set()
+        kill()
+
+    timer = threading.Timer(timeout, on_timeout)
+    timer.start()
+    try:
+        yield
+    finally:
+        timer.cancel()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+
+
+def _run_tree_sitter(tree_sitter_dir: Path, rel_paths: list[str], timeout: float) -> list[str]:
+    """Run `tree-sitter parse` and return the tree printed for each file.
+
+    The output is filtered while it streams in, rather than captured and
+    decoded as a whole.
+    """
+    cmd = [NPX, "tree-sitter", "parse", *rel_paths]
+    proc = _start_process(
+        cmd,
         cwd=str(tree_sitter_dir),
-        capture_output=True,
-        text=True,
-        timeout=10,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
     )
+    try:
+        with _kill_on_timeout(timeout, lambda: _kill_process_tree(proc), cmd):
+            assert proc.stdout is not None
+            with proc.stdout:
+                trees = split_tree_sitter_output(proc.stdout)
+            proc.wait()
+    finally:
+        _forget_process(proc)
 
-    output = result.stdout
-    # Filter to just the tree output
-    lines = output.splitlines()
-    tree_lines = []
-    in_tree = False
-    for line in lines:
-        if line.strip().startswith("(source_file"):
-            in_tree = True
-        if in_tree:
-            tree_lines.append(line)
+    # Killed by kill_subprocesses(): stop this worker too
+    if _interrupted.is_set():
+        raise KeyboardInterrupt
+    return trees
+
+
+def run_tree_sitter_parse(tree_sitter_dir: Path, file_path: Path) -> str:
+    """Run tree-sitter parse and return the output."""
+    rel_path = _relative_to(file_path, tree_sitter_dir)
+
+    trees = _run_tree_sitter(tree_sitter_dir, [str(rel_path)], timeout=10)
+    return trees[0] if trees else ""
+
+
+def run_tree_sitter_parse_batch(tree_sitter_dir: Path, file_paths: list[Path]) -> dict[Path, str]:
+    """Run a single tree-sitter parse over several files.
+
+    Starting npx/node dominates the cost of parsing a small file, so all
+    paths are handed to one invocation and the output is split per file.
+    """
+    if not file_paths:
+        return {}
+
+    rel_paths = [str(_relative_to(p, tree_sitter_dir)) for p in file_paths]
+
+    trees = _run_tree_sitter(tree_sitter_dir, rel_paths, timeout=10 * len(file_paths))
+    if not trees:
+        # Nothing parsed at all (broken CLI or grammar): running it again
+        # per file would only fail the same way, once per file
+        return {p: "" for p in file_paths}
+    if len(trees) != len(file_paths):
+        # The CLI does not name the file before each tree, so if one was
+        # skipped the trees cannot be matched up; parse them one by one.
+        return {p: run_tree_sitter_parse(tree_sitter_dir, p) for p in file_paths}
+
+    return dict(zip(file_paths, trees))
+
+
+class TreeSitterServer:
+    """A ts_parse_server.js process that keeps the grammar loaded.
+
+    Files are parsed one at a time over its stdin/stdout, so only the
+    first parse pays for starting node. Needs the `tree-sitter` npm
+    package, which the CLI does not.
+    """
+
+    def __init__(self, tree_sitter_dir: Path, timeout: float = 10) -> None:
+        self.timeout = timeout
+        self.cmd = [NODE, str(TS_SERVER_SCRIPT)]
+        self.proc = _start_process(
+            self.cmd,
+            cwd=str(tree_sitter_dir),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        try:
+            self._read_until(TS_SERVER_READY)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> "TreeSitterServer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _read_until(self, marker: bytes) -> list[bytes]:
+        """Read output lines up to (not including) the marker line."""
+        assert self.proc.stdout is not None
+        lines: list[bytes] = []
+        with _kill_on_timeout(self.timeout, lambda: _kill_process_tree(self.proc), self.cmd):
+            for line in self.proc.stdout:
+                if line.rstrip(b"\r\n") == marker:
+                    return lines
+                lines.append(line)
+
+        raise RuntimeError(f"{TS_SERVER_SCRIPT.name} exited; is the tree-sitter npm package installed?")
+
+    def parse(self, file_path: Path) -> str:
+        """Parse a file and return the output `tree-sitter parse` would give."""
+        assert self.proc.stdin is not None
+        self.proc.stdin.write(os.fsencode(file_path.resolve()) + b"\n")
+        self.proc.stdin.flush()
+
+        trees = split_tree_sitter_output(self._read_until(TS_SERVER_END))
+        return trees[0] if trees else ""
+
+    def close(self) -> None:
+        assert self.proc.stdin is not None
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            _kill_process_tree(self.proc)
+            self.proc.wait()
+        if self.proc.stdout is not None:
+            self.proc.stdout.close()
+        _forget_process(self.proc)
+
+
+# Parse results are cached on disk, keyed by a hash of their input, as the
+# .tree files and most sources rarely change between runs. Bump
+# CACHE_VERSION whenever the parsers or TreeNode change.
+CACHE_VERSION = 1
+CACHE_DIR = Path.home() / ".cache" / "vb6_lsp"
+
+
+def _cache_file(kind: str, data: bytes) -> Path:
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0".encode() + data).hexdigest()
+    return CACHE_DIR / kind / f"{digest[:16]}.pkl"
 
-    return "\n".join(tree_lines).strip()
+
+def _read_cache(cache_file: Path) -> Any:
+    # A damaged entry can make pickle raise almost anything; it is a miss
+    try:
+        with cache_file.open("rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
 
 
-def compare_file(tree_sitter_dir: Path, source_path: Path, verbose: bool = False) -> dict:
-    """Compare a single source file with its .tree file."""
+def _write_cache(cache_file: Path, value: Any) -> None:
+    # The cache is best effort: anything that cannot be stored is reparsed
+    tmp_name = None
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first; workers may store the same entry
+        with tempfile.NamedTemporaryFile(dir=cache_file.parent, delete=False) as f:
+            tmp_name = f.name
+            pickle.dump(value, f, protocol=5)
+        os.replace(tmp_name, cache_file)
+    except OSError:
+        # e.g. on Windows, when another worker has the entry open
+        if tmp_name is not None:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+
+def _grammar_stamp(tree_sitter_dir: Path) -> bytes:
+    """Identify the grammar build, so cached tree-sitter output follows it."""
+    stamps = []
+    for name in ("parser.c", "scanner.c"):
+        try:
+            stamps.append(str((tree_sitter_dir / "src" / name).stat().st_mtime_ns))
+        except OSError:
+            stamps.append("-")
+    return ":".join(stamps).encode() + b"\0"
+
+
+def load_antlr_tree(tree_path: Path, use_cache: bool = False) -> TreeNode:
+    """Read and parse an ANTLR .tree file, using the on-disk cache if enabled."""
+    raw = tree_path.read_bytes()
+    cache_file = _cache_file("antlr", raw) if use_cache else None
+    if cache_file:
+        cached = _read_cache(cache_file)
+        # Stored as to_arrays() lists: pickling the TreeNode graph recurses
+        # per nesting level, and restoring it is slower than reparsing
+        if isinstance(cached, tuple) and len(cached) == 3:
+            try:
+                return from_arrays(*cached)
+            except Exception:
+                pass  # Bad parent indices or the like; reparse below
+
+    # Same decoding (and newline handling) as Path.read_text
+    text = raw.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+    tree = parse_antlr_tree(text)
+    if cache_file:
+        _write_cache(cache_file, to_arrays(tree))
+    return tree
+
+
+def parse_sources(
+    tree_sitter_dir: Path,
+    source_paths: list[Path],
+    use_cache: bool = False,
+    use_server: bool = False,
+) -> dict[Path, str]:
+    """Get tree-sitter output for source files, from the cache if enabled.
+
+    Files that are not cached are parsed together in one tree-sitter run,
+    or by a TreeSitterServer if `use_server` is set.
+    """
+    outputs: dict[Path, str] = {}
+    cache_files: dict[Path, Path] = {}
+    if use_cache:
+        stamp = _grammar_stamp(tree_sitter_dir)
+        for p in source_paths:
+            cache_files[p] = _cache_file("tree-sitter", stamp + p.read_bytes())
+            cached = _read_cache(cache_files[p])
+            if isinstance(cached, str):
+                outputs[p] = cached
+
+    missing = [p for p in source_paths if p not in outputs]
+    if use_server and missing:
+        with TreeSitterServer(tree_sitter_dir) as server:
+            parsed = {p: server.parse(p) for p in missing}
+    else:
+        parsed = run_tree_sitter_parse_batch(tree_sitter_dir, missing)
+    for p, output in parsed.items():
+        outputs[p] = output
+        if output and p in cache_files:
+            _write_cache(cache_files[p], output)
+
+    return outputs
+
+
+def compare_file(
+    tree_sitter_dir: Path,
+    source_path: Path,
+    verbose: bool = False,
+    ts_output: Optional[str] = None,
+    use_cache: bool = False,
+    use_server: bool = False,
+    antlr_tree: Optional[TreeNode] = None,
+) -> dict[str, Any]:
+    """Compare a single source file with its .tree file.
+
+    If `ts_output` is not given, tree-sitter is run on the file, and if
+    `antlr_tree` is not given, the .tree file is read.
+    """
     tree_path = Path(str(source_path) + ".tree")
 
     if not tree_path.exists():
@@ -511,11 +862,14 @@ def compare_file(tree_sitter_dir: Path, source_path: Path, verbose: bool = False
         return {"status": "missing_source", "message": f"Source file not found: {source_path}"}
 
     # Read and parse ANTLR tree
-    antlr_text = tree_path.read_text(encoding="utf-8", errors="ignore")
-    antlr_tree = parse_antlr_tree(antlr_text)
+    if antlr_tree is None:
+        antlr_tree = load_antlr_tree(tree_path, use_cache=use_cache)
 
     # Get tree-sitter parse output
-    ts_output = run_tree_sitter_parse(tree_sitter_dir, source_path)
+    if ts_output is None:
+        ts_output = parse_sources(
+            tree_sitter_dir, [source_path], use_cache=use_cache, use_server=use_server
+        )[source_path]
     if not ts_output:
         return {"status": "parse_failed", "message": "tree-sitter parse returned no output"}
 
@@ -533,54 +887,43 @@ def compare_file(tree_sitter_dir: Path, source_path: Path, verbose: bool = False
     }
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser(
-        description="Structural comparison of ANTLR .tree outputs with tree-sitter parse trees."
-    )
-    parser.add_argument(
-        "--files",
-        nargs="*",
-        help="Paths under test/antlr_examples (e.g. statements/Write.cls).",
-    )
-    parser.add_argument(
-        "--all",
-        action="store_true",
-        help="Compare all source files with matching .tree files.",
-    )
-    parser.add_argument("--verbose", "-v", action="store_true", help="Show detailed output.")
-    parser.add_argument("--tree", action="store_true", help="Show parsed trees.")
-    args = parser.parse_args()
-
-    script_dir = Path(__file__).resolve().parent
-    tree_sitter_dir = script_dir.parent
-    root = script_dir / "antlr_examples"
+def compare_files(
+    tree_sitter_dir: Path,
+    source_paths: list[Path],
+    verbose: bool = False,
+    use_cache: bool = False,
+    use_server: bool = False,
+) -> dict[Path, dict[str, Any]]:
+    """Compare several source files, parsing them with one tree-sitter run."""
+    parseable = [
+        p for p in source_paths
+        if p.exists() and Path(str(p) + ".tree").exists()
+    ]
+    ts_outputs = parse_sources(tree_sitter_dir, parseable, use_cache=use_cache, use_server=use_server)
 
-    if not args.all and not args.files:
-        parser.error("use --files or --all")
+    return {
+        p: compare_file(
+            tree_sitter_dir, p, verbose=verbose, ts_output=ts_outputs.get(p), use_cache=use_cache
+        )
+        for p in source_paths
+    }
 
-    if args.all:
-        sources = [
-            p
-            for p in sorted(root.rglob("*"))
-            if p.suffix in SOURCE_EXTS and p.is_file()
-        ]
-    else:
-        sources = []
-        for raw in args.files:
-            path = Path(raw)
-            if not path.is_absolute():
-                path = root / raw
-            sources.append(path)
 
+def report_results(
+    sources: list[Path],
+    results: dict[Path, dict[str, Any]],
+    root: Path,
+    verbose: bool = False,
+    show_tree: bool = False,
+) -> int:
+    """Print the results for `sources` with a summary, and return the exit code."""
     match_count = mismatch_count = skip_count = error_count = 0
 
+    # Report in the original order so output is stable between runs.
     for source_path in sources:
-        try:
-            rel = source_path.relative_to(root)
-        except ValueError:
-            rel = source_path
+        rel = _relative_to(source_path, root)
 
-        result = compare_file(tree_sitter_dir, source_path, verbose=args.verbose or args.tree)
+        result = results[source_path]
         status = result["status"]
 
         if status == "missing_tree":
@@ -603,7 +946,7 @@ def main() -> int:
         if status == "match":
             match_count += 1
             print(f"[OK]   {rel.as_posix()}")
-            if args.verbose:
+            if verbose:
                 print(f"       ANTLR: {comp_result.antlr_nodes}")
                 print(f"       TS:    {comp_result.ts_nodes}")
         else:
@@ -611,10 +954,10 @@ def main() -> int:
             print(f"[DIFF] {rel.as_posix()}")
             for m in comp_result.mismatches:
                 print(f"       {m}")
-            if args.verbose:
+            if verbose:
                 print(comp_result.details)
 
-        if args.tree and result.get("ts_output"):
+        if show_tree and result.get("ts_output"):
             print("\n--- Tree-sitter output ---")
             print(result["ts_output"])
             print("\n--- ANTLR tree ---")
@@ -632,5 +975,232 @@ def main() -> int:
     return 0 if mismatch_count == 0 and error_count == 0 else 1
 
 
+def _mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class _ChangeHandler:
+    """watchdog event handler; watchdog only ever calls dispatch()."""
+
+    def __init__(self, changed: threading.Event) -> None:
+        self.changed = changed
+
+    def dispatch(self, event: Any) -> None:
+        self.changed.set()
+
+
+def _change_waiter(dirs: Iterable[Path]) -> tuple[Any, threading.Event]:
+    """Start watching `dirs` for changes, with watchdog if it is installed.
+
+    Returns the watchdog observer (None without watchdog) and an event
+    that it sets on every change.
+    """
+    changed = threading.Event()
+    try:
+        observers = importlib.import_module("watchdog.observers")
+    except ImportError:
+        return None, changed
+
+    observer = observers.Observer()
+    handler = _ChangeHandler(changed)
+    for d in dirs:
+        observer.schedule(handler, str(d), recursive=False)
+    observer.start()
+    return observer, changed
+
+
+def watch(
+    tree_sitter_dir: Path,
+    sources: list[Path],
+    root: Path,
+    verbose: bool = False,
+    show_tree: bool = False,
+    use_cache: bool = False,
+    interval: float = 0.5,
+) -> int:
+    """Compare `sources`, then compare them again whenever they change.
+
+    Parsing goes through one TreeSitterServer, which keeps every file's
+    tree and reparses only the edited part of a changed file. ANTLR trees
+    are kept too, and only reread when their .tree file changes. Runs
+    until interrupted and returns the exit code of the last comparison.
+    """
+    tree_paths = {p: Path(str(p) + ".tree") for p in sources}
+    stamps: dict[Path, tuple[Optional[int], Optional[int]]] = {}
+    antlr_trees: dict[Path, TreeNode] = {}
+    exit_code = 0
+
+    observer, changed = _change_waiter({p.parent for p in sources if p.parent.is_dir()})
+    try:
+        with TreeSitterServer(tree_sitter_dir) as server:
+            while True:
+                dirty = []
+                for p in sources:
+                    stamp = (_mtime_ns(p), _mtime_ns(tree_paths[p]))
+                    old = stamps.get(p)
+                    if old != stamp:
+                        if old is not None and old[1] != stamp[1]:
+                            antlr_trees.pop(p, None)
+                        stamps[p] = stamp
+                        dirty.append(p)
+
+                if dirty:
+                    results = {}
+                    for p in dirty:
+                        tree_path = tree_paths[p]
+                        if not (p.exists() and tree_path.exists()):
+                            # Reported as missing by compare_file
+                            results[p] = compare_file(tree_sitter_dir, p, ts_output="")
+                            continue
+                        if p not in antlr_trees:
+                            antlr_trees[p] = load_antlr_tree(tree_path, use_cache=use_cache)
+                        results[p] = compare_file(
+                            tree_sitter_dir,
+                            p,
+                            verbose=verbose or show_tree,  # keep the trees for --tree
+                            ts_output=server.parse(p),
+                            antlr_tree=antlr_trees[p],
+                        )
+                    exit_code = report_results(dirty, results, root, verbose=verbose, show_tree=show_tree)
+                    print("\nWatching for changes (Ctrl+C to stop)...", flush=True)
+
+                # Nothing sets the event without watchdog, so that just polls.
+                # The timeout also keeps Ctrl+C responsive on Windows.
+                while not changed.wait(interval) and observer is not None:
+                    pass
+                # Let an editor finish writing before looking at the files
+                time.sleep(0.05)
+                changed.clear()
+    except KeyboardInterrupt:
+        return exit_code
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Structural comparison of ANTLR .tree outputs with tree-sitter parse trees."
+    )
+    parser.add_argument(
+        "--files",
+        nargs="*",
+        help="Paths under test/antlr_examples (e.g. statements/Write.cls).",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Compare all source files with matching .tree files.",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show detailed output.")
+    parser.add_argument("--tree", action="store_true", help="Show parsed trees.")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of files to compare in parallel (default: CPU count).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Always reparse instead of using cached parse results in {CACHE_DIR}.",
+    )
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Parse with long-running node processes (ts_parse_server.js) instead of the "
+        "tree-sitter CLI. Needs the tree-sitter npm package.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and compare files again whenever they or their .tree files change. "
+        "Implies --server; uses watchdog if installed and polls otherwise.",
+    )
+    args = parser.parse_args()
+
+    script_dir = Path(__file__).resolve().parent
+    tree_sitter_dir = script_dir.parent
+    root = script_dir / "antlr_examples"
+
+    if not args.all and not args.files:
+        parser.error("use --files or --all")
+
+    if args.all:
+        sources = [
+            p
+            for p in sorted(root.rglob("*"))
+            if p.suffix in SOURCE_EXTS and p.is_file()
+        ]
+    else:
+        sources = []
+        for raw in args.files:
+            path = Path(raw)
+            if not path.is_absolute():
+                path = root / raw
+            sources.append(path)
+
+    if args.watch:
+        return watch(
+            tree_sitter_dir,
+            sources,
+            root,
+            verbose=args.verbose,
+            show_tree=args.tree,
+            use_cache=not args.no_cache,
+        )
+
+    # Each file is parsed and compared independently, and the time is spent
+    # waiting on the tree-sitter subprocess, so a thread pool is enough.
+    # Every worker gets one shard of the files and parses it in one batch,
+    # or through its own TreeSitterServer with --server.
+    verbose = args.verbose or args.tree
+    jobs = max(1, min(args.jobs, len(sources)))
+    shards = [sources[i::jobs] for i in range(jobs)]
+    results: dict[Path, dict[str, Any]] = {}
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        futures = [
+            executor.submit(
+                compare_files, tree_sitter_dir, shard, verbose, not args.no_cache, args.server
+            )
+            for shard in shards
+        ]
+        for future in as_completed(futures):
+            results.update(future.result())
+    except KeyboardInterrupt:
+        # The workers' subprocesses did not get the SIGINT; kill them rather
+        # than wait for every batch to finish
+        kill_subprocesses()
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    return report_results(sources, results, root, verbose=args.verbose, show_tree=args.tree)
+
+
 if __name__ == "__main__":
-    raise SystemExit(main())
+    # Prefer the mypyc-compiled build from setup.py when there is one, by
+    # importing the module by name; but not if this file was edited since
+    # it was built, as the build would silently run the old code.
+    import importlib.machinery
+    import importlib.util
+
+    spec = importlib.util.find_spec(Path(__file__).stem)
+    compiled = spec.origin if spec and spec.origin else ""
+    if not compiled.endswith(tuple(importlib.machinery.EXTENSION_SUFFIXES)):
+        compiled = ""
+    elif os.path.getmtime(compiled) < os.path.getmtime(__file__):
+        print(
+            f"warning: {Path(compiled).name} is older than {Path(__file__).name}, running the "
+            "source instead; rebuild with `python setup.py build_ext --inplace`",
+            file=sys.stderr,
+        )
+        compiled = ""
+
+    raise SystemExit(importlib.import_module(Path(__file__).stem).main() if compiled else main())
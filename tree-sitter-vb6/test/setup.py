@@ -0,0 +1,19 @@
+"""Optional mypyc build of compare_trees_structural.py.
+
+The script runs as plain Python; compiling it removes interpreter overhead
+from the tree parsing and traversal on large `--all` runs:
+
+    pip install mypy
+    python setup.py build_ext --inplace
+
+This leaves a compiled module next to the script, which the script then
+uses automatically. If the .py is edited afterwards, the script warns and
+runs the source until it is rebuilt; delete the module to go back.
+"""
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name="compare-trees-structural",
+    ext_modules=mypycify(["compare_trees_structural.py"]),
+)
@@ -0,0 +1,160 @@
+// Long-lived tree-sitter parser for `compare_trees_structural.py --server`.
+//
+// Reads one file path per line on stdin and writes its parse tree, in the
+// same format as `tree-sitter parse`, followed by an "---END---" line.
+// Node and the grammar are loaded once instead of once per npx run.
+//
+// The last tree of every file is kept, so when a path is sent again (as
+// `--watch` does after a change) the edit is applied to the old tree and
+// only the changed region is reparsed.
+// Needs the `tree-sitter` npm package (an optional peer dependency).
+
+const fs = require("node:fs");
+const path = require("node:path");
+const readline = require("node:readline");
+
+const Parser = require("tree-sitter");
+const VB6 = require(path.join(__dirname, ".."));
+
+const READY = "---READY---";
+const END = "---END---";
+
+// path -> { text, tree } from the last parse of that file
+const trees = new Map();
+
+// Node flags like isNamed are methods in older bindings, getters in newer ones
+function flag(node, name) {
+  const value = node[name];
+  return typeof value === "function" ? value.call(node) : value;
+}
+
+// Row and column of a string index; both count UTF-16 code units, as the
+// positions and indexes of the node binding do for string input
+function pointAt(text, index) {
+  let row = 0;
+  let lineStart = 0;
+  for (let i = text.indexOf("\n"); i !== -1 && i < index; i = text.indexOf("\n", i + 1)) {
+    row += 1;
+    lineStart = i + 1;
+  }
+  return { row, column: index - lineStart };
+}
+
+// The single edit that turns oldText into newText: everything between
+// their common prefix and common suffix
+function textEdit(oldText, newText) {
+  let start = 0;
+  const shorter = Math.min(oldText.length, newText.length);
+  while (start < shorter && oldText.charCodeAt(start) === newText.charCodeAt(start)) {
+    start += 1;
+  }
+  let oldEnd = oldText.length;
+  let newEnd = newText.length;
+  while (
+    oldEnd > start &&
+    newEnd > start &&
+    oldText.charCodeAt(oldEnd - 1) === newText.charCodeAt(newEnd - 1)
+  ) {
+    oldEnd -= 1;
+    newEnd -= 1;
+  }
+  return {
+    startIndex: start,
+    oldEndIndex: oldEnd,
+    newEndIndex: newEnd,
+    startPosition: pointAt(oldText, start),
+    oldEndPosition: pointAt(oldText, oldEnd),
+    newEndPosition: pointAt(newText, newEnd),
+  };
+}
+
+function parseFile(filePath) {
+  const text = fs.readFileSync(filePath, "utf8");
+  const previous = trees.get(filePath);
+  let tree;
+  if (!previous) {
+    tree = parser.parse(text);
+  } else if (previous.text === text) {
+    tree = previous.tree;
+  } else {
+    previous.tree.edit(textEdit(previous.text, text));
+    tree = parser.parse(text, previous.tree);
+  }
+  trees.set(filePath, { text, tree });
+  return tree;
+}
+
+// Same layout as the CLI: named (and missing) nodes only, two spaces of
+// indent per level, "field: " prefixes and [row, column] ranges.
+function formatTree(tree) {
+  const cursor = tree.walk();
+  let out = "";
+  let indent = 0;
+  let visitedChildren = false;
+
+  for (;;) {
+    const node = cursor.currentNode;
+    const shown = flag(node, "isNamed") || flag(node, "isMissing");
+
+    if (visitedChildren) {
+      if (shown) {
+        out += ")";
+      }
+      if (cursor.gotoNextSibling()) {
+        visitedChildren = false;
+      } else if (cursor.gotoParent()) {
+        visitedChildren = true;
+        indent -= 1;
+      } else {
+        break;
+      }
+      continue;
+    }
+
+    if (shown) {
+      if (out) {
+        out += "\n";
+      }
+      out += "  ".repeat(indent);
+      const field = cursor.currentFieldName;
+      if (field) {
+        out += `${field}: `;
+      }
+      if (flag(node, "isMissing")) {
+        const type = flag(node, "isNamed") ? node.type : JSON.stringify(node.type);
+        out += `(MISSING ${type}`;
+      } else {
+        out += `(${node.type}`;
+      }
+      const start = node.startPosition;
+      const end = node.endPosition;
+      out += ` [${start.row}, ${start.column}] - [${end.row}, ${end.column}]`;
+    }
+
+    if (cursor.gotoFirstChild()) {
+      indent += 1;
+    } else {
+      visitedChildren = true;
+    }
+  }
+
+  return out;
+}
+
+const parser = new Parser();
+parser.setLanguage(VB6);
+
+const input = readline.createInterface({ input: process.stdin, terminal: false });
+
+input.on("line", (filePath) => {
+  let output = "";
+  try {
+    output = formatTree(parseFile(filePath));
+  } catch (err) {
+    trees.delete(filePath);
+    process.stderr.write(`${filePath}: ${err.message}\n`);
+  }
+  process.stdout.write(`${output}\n${END}\n`);
+});
+
+process.stdout.write(`${READY}\n`);